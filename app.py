@@ -1,58 +1,7 @@
 import gradio as gr
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Backend API URL
-API_URL = os.getenv("BACKEND_API_URL", "http://127.0.0.1:8000")
-
-
-def fetch_namespaces():
-    """Fetch namespaces from the backend."""
-    try:
-        response = requests.get(f"{API_URL}/namespaces")
-        if response.status_code == 200:
-            return response.json().get("namespaces", [])
-        else:
-            print(f"Failed to fetch namespaces. Status code: {response.status_code}")
-            return []
-    except Exception as e:
-        print(f"Error fetching namespaces: {e}")
-        return []
-
-
-def submit_repository(repo_url):
-    """Clone and index a new repository by sending it to the backend."""
-    try:
-        response = requests.post(f"{API_URL}/submit-repo", json={"repo_url": repo_url})
-        if response.status_code == 200:
-            return response.json().get("message", "Repository indexed successfully! 🚀")
-        else:
-            return f"Error: {response.json().get('detail', 'Unknown error')}"
-    except Exception as e:
-        return f"Failed to clone repository: {str(e)}"
-
-
-def query_with_history(message, history, namespace):
-    """Query the backend with the chat history."""
-    try:
-        # Convert the history to the backend API's expected format
-        formatted_history = [
-            {"role": "user", "content": human} if i % 2 == 0 else {"role": "assistant", "content": ai}
-            for i, (human, ai) in enumerate(history)
-        ]
-        payload = {"query": message, "history": formatted_history, "namespace": namespace}
-        response = requests.post(f"{API_URL}/query", json=payload)
-        if response.status_code == 200:
-            answer = response.json().get("answer", "No response.")
-            return history + [(message, answer)]
-        else:
-            return history + [(message, f"Error: {response.json().get('detail', 'Unknown error')}")]
-    except Exception as e:
-        return history + [(message, f"Failed to process query: {str(e)}")]
+import threading
+
+from client import fetch_namespaces, submit_repository, query_with_history, warm_backend_session
 
 
 def create_ui():
@@ -85,7 +34,7 @@ def create_ui():
                     choices=namespaces, label="Namespace", interactive=True
                 )
 
-            chatbot = gr.Chatbot(label="Codebase Chatbot")
+            chatbot = gr.Chatbot(label="Codebase Chatbot", type="messages")
             message_input = gr.Textbox(placeholder="Enter your message here...")
             send_button = gr.Button("Send")
 
@@ -102,17 +51,18 @@ def create_ui():
                 )
             return gr.update(), "Please provide a repository URL.", current_namespace, current_namespace
 
-        def handle_query(message, history, namespace):
+        async def handle_query(message, history, namespace):
             """Handle query submission while preserving chat history."""
             if namespace is None:
-                new_history = history + [("System", "Please select a namespace first!")]
-                return new_history, new_history, gr.update(value="")
-            updated_history = query_with_history(message, history, namespace)
-            return (
-                updated_history,
-                updated_history,  # Update chat_history state
-                gr.update(value=""),  # Clear input box after sending
-            )
+                new_history = history + [{"role": "assistant", "content": "Please select a namespace first!"}]
+                yield new_history, new_history, gr.update(value="")
+                return
+            async for updated_history in query_with_history(message, history, namespace):
+                yield (
+                    updated_history,
+                    updated_history,  # Update chat_history state
+                    gr.update(value=""),  # Clear input box after sending
+                )
 
         def reset_chat_on_namespace_change(selected_namespace, current_namespace):
             """Reset chat history only when switching namespaces."""
@@ -134,16 +84,22 @@ def create_ui():
             outputs=[chat_history, namespace_state, clone_status],
         )
 
-        # Bind send button to query handler
+        # Bind send button to query handler; the handler is I/O bound on the
+        # backend, so let many queries run concurrently
         send_button.click(
             handle_query,
             inputs=[message_input, chat_history, namespace_dropdown],
             outputs=[chatbot, chat_history, message_input],
+            concurrency_limit=20,
         )
 
+    # Warm the connection pool in the background while the UI finishes booting
+    threading.Thread(target=warm_backend_session, daemon=True).start()
+
     return demo
 
 
 if __name__ == "__main__":
     demo = create_ui()
-    demo.launch()
+    demo.queue(default_concurrency_limit=20, max_size=100)
+    demo.launch(max_threads=100)
@@ -1,18 +1,117 @@
 import os
+import json
 import logging
-from typing import List, Dict, Optional
-from tree_sitter_languages import get_parser
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from tree_sitter_languages import get_language, get_parser
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+# Library module: no basicConfig here — logging setup belongs to the app entrypoint
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
-SUPPORTED_EXTENSIONS = {".py", ".java", ".js", ".ts", ".cpp", ".h", ".ipynb"}
-IGNORED_EXTENSIONS = {
-    ".pkl", ".npy", ".h5", ".bin", ".exe", ".dll", ".so", ".o", ".class", ".log", ".txt", 
+SUPPORTED_EXTENSIONS = frozenset({".py", ".java", ".js", ".ts", ".cpp", ".h", ".ipynb"})
+IGNORED_EXTENSIONS = frozenset({
+    ".pkl", ".npy", ".h5", ".bin", ".exe", ".dll", ".so", ".o", ".class", ".log", ".txt",
     ".md", ".csv", ".json", ".xml", ".yaml", ".yml", ".lock"
+})
+IGNORED_DIRS = frozenset({"node_modules", "venv", "env", "dist", "build", ".git", "__pycache__", ".next", ".vscode", "vendor"})
+
+EXTENSION_LANGUAGE_MAP = {
+    ".py": "python",
+    ".ipynb": "python",
+    ".java": "java",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".cpp": "cpp",
+    ".h": "cpp",
+}
+
+# Tree-sitter queries per language; the capture name doubles as the chunk type.
+# Matching runs in the C core and finds nested definitions (e.g. methods inside
+# classes) that a top-level walk misses. Declarations/imports/exports are
+# anchored to the root node, though — unanchored patterns match at every
+# depth, which would turn each function-local `const x = ...` into its own
+# noise chunk.
+_JS_CHUNK_QUERY = """
+    (class_declaration) @class
+    (function_declaration) @method
+    (method_definition) @method
+    (program (lexical_declaration) @variable)
+    (program (variable_declaration) @variable)
+    (program (import_statement) @import)
+    (program (export_statement) @export)
+"""
+_CHUNK_QUERIES = {
+    "python": """
+        (class_definition) @class
+        (function_definition) @method
+        (import_statement) @import
+        (import_from_statement) @import
+    """,
+    "javascript": _JS_CHUNK_QUERY,
+    "typescript": _JS_CHUNK_QUERY,
+    "java": """
+        (class_declaration) @class
+        (method_declaration) @method
+        (import_declaration) @import
+    """,
+    "cpp": """
+        (class_specifier) @class
+        (function_definition) @method
+        (translation_unit (declaration) @variable)
+    """,
+}
+
+# Node type -> chunk type for the fallback walk, precomputed so dispatch is
+# one dict lookup per node instead of a chain of set-membership tests
+_NODE_TYPE_MAP = {
+    "class": "class",
+    "class_declaration": "class",
+    "class_definition": "class",
+    "function": "method",
+    "function_definition": "method",
+    "method": "method",
+    "method_declaration": "method",
+    "variable_declaration": "variable",
+    "declaration": "variable",
+    "let_declaration": "variable",
+    "const_declaration": "variable",
+    "import_statement": "import",
+    "import": "import",
+    "export_statement": "export",
+    "export": "export",
 }
-IGNORED_DIRS = {"node_modules", "venv", "env", "dist", "build", ".git", "__pycache__", ".next", ".vscode", "vendor"}
+
+# Compiled queries per language (None when compilation failed or no query exists)
+_COMPILED_QUERIES: Dict[str, object] = {}
+
+def _get_chunk_query(language: str):
+    """Return the compiled chunk query for a language, or None to use the fallback walk."""
+    if language not in _COMPILED_QUERIES:
+        compiled = None
+        source = _CHUNK_QUERIES.get(language)
+        if source is not None:
+            try:
+                compiled = get_language(language).query(source)
+            except Exception as e:
+                logger.error("Error compiling chunk query for %s: %s", language, e)
+        _COMPILED_QUERIES[language] = compiled
+    return _COMPILED_QUERIES[language]
+
+# Loaded tree-sitter parsers per language, so the grammar shared library is
+# loaded once per process instead of once per file.
+_LANGUAGE_PARSERS: Dict[str, object] = {}
+
+def _get_cached_parser(language: str):
+    """Return the tree-sitter parser for a language, loading it on first use."""
+    parser = _LANGUAGE_PARSERS.get(language)
+    if parser is None:
+        logger.info("Initializing parser for language: %s", language)
+        parser = get_parser(language)
+        _LANGUAGE_PARSERS[language] = parser
+    return parser
 
 class SimpleTreeSitterParser:
     def __init__(self, language: str):
@@ -21,147 +120,236 @@ class SimpleTreeSitterParser:
         """
         self.language = language
         try:
-            logger.info(f"Initializing parser for language: {language}")
-            self.parser = get_parser(language)
-            logger.debug(f"Parser for {language} initialized: {self.parser}")
+            self.parser = _get_cached_parser(language)
         except Exception as e:
-            logger.error(f"Error initializing parser for {language}: {str(e)}")
+            logger.error("Error initializing parser for %s: %s", language, e)
             raise ValueError(f"Error initializing parser for {language}: {str(e)}")
 
-    def parse(self, code: str) -> List[Dict]:
+    def parse(self, code: bytes) -> List[Dict]:
         """
-        Parse the given code to extract structured chunks (e.g., classes, methods, variables).
+        Parse the given code (as UTF-8 bytes) to extract structured chunks
+        (e.g., classes, methods, variables).
         Returns a list of extracted chunks with their type, content, and line ranges.
         """
         try:
-            tree = self.parser.parse(bytes(code, "utf-8"))
+            tree = self.parser.parse(code)
             root = tree.root_node
         except Exception as e:
-            logger.error(f"Error parsing code: {str(e)}")
+            logger.error("Error parsing code: %s", e)
             raise ValueError(f"Error parsing code: {str(e)}")
 
         chunks = []
-        for child in root.children:
-            logger.debug(f"Node Type: {child.type}, Start: {child.start_point}, End: {child.end_point}")
 
-            # Extract recognized chunks
-            if child.type in {"class", "class_declaration", "class_definition"}:
+        # Preferred path: compiled query, matched in the tree-sitter C core
+        query = _get_chunk_query(self.language)
+        if query is not None:
+            for node, tag in query.captures(root):
                 chunks.append({
-                    "type": "class",
-                    "content": code[child.start_byte:child.end_byte],
-                    "start_line": child.start_point[0] + 1,
-                    "end_line": child.end_point[0] + 1,
-                })
-            elif child.type in {"function", "function_definition", "method", "method_declaration"}:
-                chunks.append({
-                    "type": "method",
-                    "content": code[child.start_byte:child.end_byte],
-                    "start_line": child.start_point[0] + 1,
-                    "end_line": child.end_point[0] + 1,
+                    "type": tag,
+                    "content": code[node.start_byte:node.end_byte].decode("utf-8", errors="replace"),
+                    "start_line": node.start_point[0] + 1,
+                    "end_line": node.end_point[0] + 1,
                 })
-            elif child.type in {"variable_declaration", "declaration", "let_declaration", "const_declaration"}:
-                chunks.append({
-                    "type": "variable",
-                    "content": code[child.start_byte:child.end_byte],
-                    "start_line": child.start_point[0] + 1,
-                    "end_line": child.end_point[0] + 1,
-                })
-            elif child.type in {"import_statement", "import"}:
-                chunks.append({
-                    "type": "import",
-                    "content": code[child.start_byte:child.end_byte],
-                    "start_line": child.start_point[0] + 1,
-                    "end_line": child.end_point[0] + 1,
-                })
-            elif child.type in {"export_statement", "export"}:
+            return chunks
+
+        # Fallback: walk the top-level nodes in Python. A TreeCursor visits
+        # siblings in place instead of materializing the root.children list of
+        # Node wrappers.
+        cursor = tree.walk()
+        if not cursor.goto_first_child():
+            return chunks
+        while True:
+            child = cursor.node
+            # Extract recognized chunks via one dict lookup per node
+            kind = _NODE_TYPE_MAP.get(child.type)
+            if kind is not None:
                 chunks.append({
-                    "type": "export",
-                    "content": code[child.start_byte:child.end_byte],
+                    "type": kind,
+                    "content": code[child.start_byte:child.end_byte].decode("utf-8", errors="replace"),
                     "start_line": child.start_point[0] + 1,
                     "end_line": child.end_point[0] + 1,
                 })
-            else:
-                logger.warning(f"Unrecognized node type: {child.type}")
+            if not cursor.goto_next_sibling():
+                break
         return chunks
 
-def get_file_content(file_path: str) -> Optional[str]:
+# Files above this size (generated bundles, lockfile dumps, ...) are skipped entirely
+MAX_FILE_SIZE = 1_000_000
+
+def get_file_bytes(file_path: str) -> Optional[bytes]:
     """
-    Read and return the content of a file. Returns None if reading fails.
+    Read and return the raw bytes of a file via mmap, so the buffer comes
+    straight from the page cache. Returns None if reading fails or the file
+    exceeds MAX_FILE_SIZE. Tree-sitter consumes the bytes directly, so no
+    decode happens here.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        size = os.path.getsize(file_path)
+        if size > MAX_FILE_SIZE:
+            logger.warning("Skipping oversized file (%d bytes): %s", size, file_path)
+            return None
+        if size == 0:
+            return b""
+        with open(file_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # A NUL byte in the head means binary — bail before touching the rest
+                if b"\x00" in mm[:1024]:
+                    logger.warning("Skipping binary file: %s", file_path)
+                    return None
+                # The tree-sitter binding wants bytes, so materialize from the mapping
+                return bytes(mm)
     except Exception as e:
-        logger.error(f"Error reading file {file_path}: {str(e)}")
+        logger.error("Error reading file %s: %s", file_path, e)
         return None
 
-def parse_repo_store_all(repo_path: str) -> List[Dict]:
+# Below this many files the process-pool startup cost outweighs the win
+_MIN_PARALLEL_FILES = 8
+
+# Files read ahead of the parser in the sequential path
+_PREFETCH_WINDOW = 4
+
+# One SimpleTreeSitterParser per language per process; parse() keeps no state
+# between calls, so the instances are safe to reuse across files.
+_PARSER_CACHE: Dict[str, SimpleTreeSitterParser] = {}
+
+def _get_parser_for(language: str) -> SimpleTreeSitterParser:
+    parser = _PARSER_CACHE.get(language)
+    if parser is None:
+        parser = _PARSER_CACHE[language] = SimpleTreeSitterParser(language)
+    return parser
+
+def _extract_notebook_source(data: bytes) -> Optional[bytes]:
     """
-    Parse the repository and store both parsed structured chunks and full file content.
-    Returns a list of chunks, including parsed and raw content.
+    Pull the Python source out of a notebook's code cells. Notebooks are JSON,
+    so parsing them with the Python grammar directly only produces garbage and
+    JSON-shaped blobs in the index; markdown cells are dropped entirely.
     """
-    all_chunks = []
+    try:
+        notebook = json.loads(data)
+        source = "\n".join(
+            "".join(cell.get("source", []))
+            for cell in notebook.get("cells", [])
+            if cell.get("cell_type") == "code"
+        )
+    except Exception as e:
+        logger.debug("Failed to extract notebook source: %s", e)
+        return None
+    return source.encode("utf-8") if source else None
 
-    for root, _, files in os.walk(repo_path):
-        # Skip ignored directories
-        if any(ignored_dir in root for ignored_dir in IGNORED_DIRS):
-            continue
+def _parse_one_file(task: Tuple[str, str]) -> List[Dict]:
+    """
+    Read and parse a single file, returning its structured chunks plus the
+    whole-file entry. Runs in worker processes, so parsers are cached per worker.
+    """
+    file_path, language = task
+    return _parse_file_bytes(file_path, language, get_file_bytes(file_path))
+
+def _parse_file_bytes(file_path: str, language: str, code: Optional[bytes]) -> List[Dict]:
+    """Parse already-read file bytes; the read/parse split lets callers prefetch."""
+    chunks = []
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Processing file: %s", file_path)
+    if not code:
+        logger.debug("No content found in %s", file_path)
+        return chunks
+
+    # Notebooks are JSON wrappers: parse only the code cells as Python
+    if file_path.endswith(".ipynb"):
+        code = _extract_notebook_source(code)
+        if not code:
+            logger.debug("No code cells found in %s", file_path)
+            return chunks
+
+    # Decode once for the whole-file entry; chunk slices decode lazily in parse()
+    text = code.decode("utf-8", errors="replace")
+    try:
+        # Attempt parsing and store structured chunks
+        parser = _get_parser_for(language)
+        chunks.extend(parser.parse(code))
+
+        # The structured chunks already cover the file's content; fall back to
+        # the whole file only when parsing recognized nothing, so the same
+        # bytes aren't embedded and stored twice
+        if not chunks:
+            chunks.append({
+                "type": "file",
+                "content": text,
+                "file_path": file_path
+            })
+    except ValueError as ve:
+        logger.error("Language not supported or parsing error for %s: %s", file_path, ve)
+        chunks.append({
+            "type": "file",
+            "content": text,
+            "file_path": file_path
+        })
+    except Exception as e:
+        logger.error("Unexpected error processing %s: %s", file_path, e)
+        chunks.append({
+            "type": "file",
+            "content": text,
+            "file_path": file_path
+        })
+    return chunks
+
+def collect_parse_tasks(repo_path: str) -> List[Tuple[str, str]]:
+    """
+    Walk the repository and return (file_path, language) work items for
+    every supported source file.
+    """
+    tasks = []
+    for root, dirs, files in os.walk(repo_path):
+        # Prune ignored directories in place so os.walk never descends into them
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
 
         for file in files:
-            file_path = os.path.join(root, file)
-            extension = os.path.splitext(file)[1]
+            # rfind avoids the tuple allocation of os.path.splitext and cheaply
+            # rejects extensionless files, the common case in large trees
+            dot = file.rfind(".")
+            if dot < 0:
+                continue
+            extension = file[dot:]
 
-            # Skip ignored file extensions
-            if extension in IGNORED_EXTENSIONS:
-                logger.warning(f"Skipping unsupported file type: {file_path}")
+            language = EXTENSION_LANGUAGE_MAP.get(extension)
+            if language is None:
+                logger.debug("Unsupported file type: %s", file)
                 continue
 
-            # Process only supported extensions
-            if extension in SUPPORTED_EXTENSIONS:
-                language = {
-                    ".py": "python",
-                    ".ipynb": "python",
-                    ".java": "java",
-                    ".js": "javascript",
-                    ".ts": "typescript",
-                    ".cpp": "cpp",
-                    ".h": "cpp",
-                }.get(extension)
-
-                try:
-                    logger.info(f"Processing file: {file_path}")
-                    code = get_file_content(file_path)
-                    if not code:
-                        logger.warning(f"No content found in {file_path}")
-                        continue
-
-                    # Attempt parsing and store structured chunks
-                    parser = SimpleTreeSitterParser(language)
-                    chunks = parser.parse(code)
-                    all_chunks.extend(chunks)
-
-                    # Also store the entire file content as a separate entry
-                    all_chunks.append({
-                        "type": "file",
-                        "content": code,
-                        "file_path": file_path
-                    })
-                except ValueError as ve:
-                    logger.error(f"Language not supported or parsing error for {file_path}: {ve}")
-                    all_chunks.append({
-                        "type": "file",
-                        "content": code,
-                        "file_path": file_path
-                    })
-                except Exception as e:
-                    logger.error(f"Unexpected error processing {file_path}: {str(e)}")
-                    all_chunks.append({
-                        "type": "file",
-                        "content": code,
-                        "file_path": file_path
-                    })
-            else:
-                logger.warning(f"Unsupported file type: {file_path}")
+            tasks.append((os.path.join(root, file), language))
+    return tasks
+
+def parse_repo_store_all(repo_path: str) -> List[Dict]:
+    """
+    Parse the repository and store both parsed structured chunks and full file content.
+    Files are parsed in parallel across CPU cores on larger repositories.
+    Returns a list of chunks, including parsed and raw content.
+    """
+    tasks = collect_parse_tasks(repo_path)
+    all_chunks = []
+
+    if len(tasks) < _MIN_PARALLEL_FILES:
+        # Overlap disk I/O with parse CPU time: a small reader pool stays a
+        # few files ahead, so on cold caches the next file's bytes are already
+        # in memory by the time the parser finishes the current one.
+        with ThreadPoolExecutor(max_workers=2) as reader:
+            pending = deque(
+                ((path, language), reader.submit(get_file_bytes, path))
+                for path, language in tasks[:_PREFETCH_WINDOW]
+            )
+            next_idx = len(pending)
+            while pending:
+                (file_path, language), future = pending.popleft()
+                code = future.result()
+                if next_idx < len(tasks):
+                    path, lang = tasks[next_idx]
+                    pending.append(((path, lang), reader.submit(get_file_bytes, path)))
+                    next_idx += 1
+                all_chunks.extend(_parse_file_bytes(file_path, language, code))
+    else:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for chunks in executor.map(_parse_one_file, tasks, chunksize=16):
+                all_chunks.extend(chunks)
 
     if not all_chunks:
         raise ValueError("No valid code chunks found in the repository.")
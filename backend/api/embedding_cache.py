@@ -0,0 +1,51 @@
+"""Disk-backed cache of chunk embeddings keyed by content hash.
+
+Re-submitting a repository (or overlapping chunks within one submission)
+re-encodes identical text; caching by blake2b of the content makes those
+encodes free on every run after the first. Entries are stored as one .npy
+file per key so only stdlib + numpy are needed.
+"""
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+CACHE_DIR = os.getenv("EMB_CACHE_DIR", "./.emb_cache")
+
+
+def content_key(text: str) -> str:
+    """Return the cache key for a chunk of text."""
+    return hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + ".npy")
+
+
+def get_many(keys: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Return {key: vector} for every key present in the cache."""
+    hits = {}
+    for key in keys:
+        path = _entry_path(key)
+        try:
+            if os.path.exists(path):
+                hits[key] = np.load(path)
+        except Exception as e:
+            # Treat unreadable entries as misses; they will be rewritten
+            logger.debug("Dropping unreadable cache entry %s: %s", key, e)
+    return hits
+
+
+def set_many(items: Iterable[Tuple[str, np.ndarray]]) -> None:
+    """Store (key, vector) pairs, ignoring individual write failures."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for key, vec in items:
+        try:
+            np.save(_entry_path(key), vec)
+        except Exception as e:
+            logger.debug("Failed to write cache entry %s: %s", key, e)
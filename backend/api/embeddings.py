@@ -3,15 +3,213 @@
     - Token limits: splits over large chunks using text-based chunkers
     - More languages can be added in teh future
 """
-from typing import List, Dict
+import functools
+import logging
+import os
+from typing import List, Dict, Optional
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+from . import embedding_cache
 
-def get_huggingface_embeddings(text: List[str], model_name="sentence-transformers/all-mpnet-base-v2"):
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# Inference backend passed to SentenceTransformer: "torch" (default), "onnx"
+# or "openvino". ONNX Runtime gives a solid multiple on CPU encode throughput
+# from graph fusions; it needs the optional onnxruntime/optimum extras
+# installed, so it's opt-in via EMB_BACKEND rather than the default.
+EMBEDDING_BACKEND = os.getenv("EMB_BACKEND", "torch")
+
+# Sentences encoded per forward pass; override with EMB_BATCH
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMB_BATCH", 64))
+
+# all-mpnet-base-v2 truncates at 384 tokens; window oversized chunks below
+# that with some overlap so no content silently disappears
+MAX_WINDOW_TOKENS = 300
+WINDOW_STRIDE = 250
+
+# Output precision for the vectors shipped to Pinecone. Set EMB_PRECISION=int8
+# against an index created with vector_type="int8" to cut payload and index
+# memory 4x; the default stays float32 because the existing "codebase-app"
+# index stores float vectors. Changing this requires a fresh EMB_CACHE_DIR,
+# since cached vectors (and the calibration ranges below) keep the precision
+# they were written with.
+EMBEDDING_PRECISION = os.getenv("EMB_PRECISION", "float32")
+
+# Calibration ranges loaded/derived once per process
+_calibration_ranges: Optional[np.ndarray] = None
+
+# Minimum per-dimension bucket width; dimensions narrower than this (likely
+# when the calibration batch is small) are widened so no step size is zero
+_MIN_RANGE_WIDTH = 1e-3
+
+
+def _int8_ranges(sample: Optional[np.ndarray]) -> np.ndarray:
+    """Return the per-dimension (min, max) calibration ranges for quantization.
+
+    Quantizing each batch against its own min/max would put every batch — and
+    every single-vector query — on a different int8 scale, so the ranges are
+    derived once from the first corpus batch seen and persisted next to the
+    embedding cache. Every later batch and every query quantizes against the
+    same ranges, keeping stored and query vectors comparable. Dimensions where
+    the batch had (near-)equal min and max are widened so the bucket step is
+    never zero, which makes even a tiny first batch a valid calibration.
+    """
+    global _calibration_ranges
+    if _calibration_ranges is None:
+        path = os.path.join(embedding_cache.CACHE_DIR, "int8_ranges.npy")
+        if os.path.exists(path):
+            _calibration_ranges = np.load(path)
+        elif sample is not None:
+            ranges = np.vstack([sample.min(axis=0), sample.max(axis=0)])
+            narrow = ranges[1] - ranges[0] < _MIN_RANGE_WIDTH
+            ranges[0, narrow] -= _MIN_RANGE_WIDTH
+            ranges[1, narrow] += _MIN_RANGE_WIDTH
+            _calibration_ranges = ranges
+            os.makedirs(embedding_cache.CACHE_DIR, exist_ok=True)
+            np.save(path, ranges)
+        else:
+            raise RuntimeError(
+                f"EMB_PRECISION={EMBEDDING_PRECISION} requires calibration ranges; "
+                "ingest a repository first so they can be derived from a corpus batch."
+            )
+    return _calibration_ranges
+
+
+def apply_precision(vecs: np.ndarray, calibrate: bool = False) -> np.ndarray:
+    """Quantize a batch of float32 vectors to EMBEDDING_PRECISION (no-op by default).
+
+    Corpus encoders pass calibrate=True so the first large batch can seed the
+    shared calibration ranges; query callers quantize against the existing
+    ranges only.
+    """
+    if EMBEDDING_PRECISION == "float32":
+        return vecs
+    from sentence_transformers.quantization import quantize_embeddings
+
+    return quantize_embeddings(
+        vecs,
+        precision=EMBEDDING_PRECISION,
+        ranges=_int8_ranges(vecs if calibrate else None),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_model(model_name: str) -> SentenceTransformer:
+    """Load the embedding model once per process and reuse it across calls.
+
+    Runs on GPU in FP16 when one is available; convert_to_numpy at the call
+    sites casts the output back to fp32, so downstream payloads are unchanged.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if EMBEDDING_BACKEND != "torch":
+        try:
+            return SentenceTransformer(model_name, device=device, backend=EMBEDDING_BACKEND)
+        except Exception as e:
+            logger.warning(
+                "Falling back to the torch backend; %s backend unavailable: %s",
+                EMBEDDING_BACKEND, e,
+            )
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        model = model.half()
+    return model
+
+
+def split_oversized_chunks(chunks: List[Dict], model_name=DEFAULT_MODEL_NAME) -> List[Dict]:
+    """Replace chunks longer than the encoder window with overlapping sub-windows.
+
+    The encoder truncates anything past its max sequence length, so a
+    whole-file chunk would embed only its first ~384 tokens while still paying
+    for the full tokenizer pass. Oversized chunks become windows of
+    MAX_WINDOW_TOKENS tokens with WINDOW_STRIDE steps; line ranges are
+    remapped proportionally so retrieval metadata stays roughly accurate.
+    Short chunks pass through untouched.
+    """
+    tokenizer = _get_model(model_name).tokenizer
+    out = []
+    for chunk in chunks:
+        content = chunk["content"] if isinstance(chunk, dict) else chunk
+        ids = tokenizer(content, add_special_tokens=False).input_ids
+        total = len(ids)
+        if total <= MAX_WINDOW_TOKENS:
+            out.append(chunk)
+            continue
+
+        for offset in range(0, total, WINDOW_STRIDE):
+            window_text = tokenizer.decode(ids[offset:offset + MAX_WINDOW_TOKENS])
+            if not isinstance(chunk, dict):
+                out.append(window_text)
+                continue
+            window = dict(chunk)
+            window["content"] = window_text
+            if "start_line" in chunk and "end_line" in chunk:
+                span = chunk["end_line"] - chunk["start_line"]
+                window["start_line"] = chunk["start_line"] + round(span * offset / total)
+                window["end_line"] = chunk["start_line"] + round(span * min(offset + MAX_WINDOW_TOKENS, total) / total)
+            out.append(window)
+    return out
+
+
+def _l2_normalize(vecs: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place with one vectorized pass over the matrix.
+
+    Normalizing the full batch here is cheaper than the per-tensor torch
+    normalization inside encode(), and it runs on the fp32 numpy output so
+    fp16 GPU inference doesn't lose precision in the norm.
+    """
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    vecs /= norms
+    return vecs
+
+
+def _encode_batched(model: SentenceTransformer, text: List[str]):
+    """Encode a list of texts with length-sorted ("smart") batching.
+
+    Sorting means each batch pads only to its own longest member instead of
+    the corpus-wide maximum; the permutation is inverted afterwards so the
+    output rows stay aligned with the input order.
+    """
+    order = np.argsort([len(t) for t in text])
+    vecs = model.encode(
+        [text[i] for i in order],
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    vecs = apply_precision(_l2_normalize(np.ascontiguousarray(vecs, dtype=np.float32)), calibrate=True)
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return vecs[inverse]
+
+
+def get_huggingface_embeddings(text: List[str], model_name=DEFAULT_MODEL_NAME):
     """Generates the proper embeddings for the parsed chunks including the hierarchical order
-        
+
+    Embeddings are cached on disk keyed by a hash of the content, so
+    re-submitting a repository (or duplicate chunks within one submission)
+    only encodes text that has never been seen before.
     """
-    
-    model = SentenceTransformer(model_name)
-        
-    return model.encode(text, show_progress_bar=True)
\ No newline at end of file
+
+    keys = [embedding_cache.content_key(t) for t in text]
+    vectors = embedding_cache.get_many(set(keys))
+
+    # Encode each distinct missing text exactly once
+    miss_keys, miss_texts, seen = [], [], set()
+    for t, key in zip(text, keys):
+        if key not in vectors and key not in seen:
+            seen.add(key)
+            miss_keys.append(key)
+            miss_texts.append(t)
+
+    if miss_texts:
+        miss_vecs = _encode_batched(_get_model(model_name), miss_texts)
+        embedding_cache.set_many(zip(miss_keys, miss_vecs))
+        vectors.update(zip(miss_keys, miss_vecs))
+
+    return np.asarray([vectors[key] for key in keys])
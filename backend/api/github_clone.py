@@ -1,10 +1,13 @@
 import os
-from git import Repo  # Use GitPython for cloning
+from git import GitCommandError, Repo  # Use GitPython for cloning
 from fastapi import HTTPException
 from pydantic import BaseModel
 
 CLONE_DIR = "./cloned_repos"
 
+# Only the latest commit's tree is parsed, so skip history and old blobs
+SHALLOW_CLONE_OPTIONS = ["--depth=1", "--filter=blob:none", "--single-branch", "--no-tags"]
+
 class RepoRequest(BaseModel):
     repo_url: str
 
@@ -24,8 +27,12 @@ async def clone_repo(request: RepoRequest):
             return {"status": "already_cloned", "repo_path": repo_path}
 
         # Clone the repository directly using GitPython
-        Repo.clone_from(repo_url, repo_path)
-        
+        try:
+            Repo.clone_from(repo_url, repo_path, multi_options=SHALLOW_CLONE_OPTIONS)
+        except GitCommandError:
+            # Some servers reject partial-clone filters; fall back to a full clone
+            Repo.clone_from(repo_url, repo_path)
+
         return {"status": "cloned", "repo_path": repo_path}
     
     except Exception as e:
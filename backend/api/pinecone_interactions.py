@@ -1,26 +1,65 @@
+import functools
+import hashlib
 import os
+import numpy as np
 from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
 from langchain.schema import Document
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from .embeddings import apply_precision
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_KEY = "codebase-app"
 
+# Vectors sent per upsert request
+UPSERT_BATCH_SIZE = 100
+
 pc = Pinecone(api_key=PINECONE_API_KEY)
 
-pinecone_index = pc.Index(PINECONE_INDEX_KEY)
+# pool_threads backs the async_req upserts in store_embeddings
+pinecone_index = pc.Index(PINECONE_INDEX_KEY, pool_threads=10)
 
 #Embedding model initilaize globally
 embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
 
-def store_embeddings(documents, namespace="default-name"):
-    """Store documents and embeddings in Pincone V-DB"""
-    vector_store = PineconeVectorStore.from_documents(
-        documents=documents,
-        embedding=embedding_model,
-        index_name=PINECONE_INDEX_KEY,
-        namespace=namespace
-    )
-    
-    return vector_store
\ No newline at end of file
+@functools.lru_cache(maxsize=4096)
+def cached_query_vector(query: str) -> tuple:
+    """Embed a query string, serving repeated queries from an LRU cache.
+
+    The query vector goes through the same precision step as the stored
+    corpus, so int8 indexes are queried with int8 vectors.
+    """
+    vector = embedding_model.embed_query(query)
+    vector = apply_precision(np.asarray([vector], dtype=np.float32))[0]
+    return tuple(vector.tolist())
+
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _vector_id(content: str) -> str:
+    # Deterministic ids: re-submitting a repo overwrites vectors in place
+    # instead of piling up duplicates
+    return hashlib.blake2b(content.encode("utf-8", "replace"), digest_size=16).hexdigest()
+
+def store_embeddings(documents, embeddings, namespace="default-name"):
+    """Upsert documents with their precomputed embeddings into Pincone V-DB
+
+    The embeddings are used as-is (no re-encoding) and upserts are issued
+    asynchronously in batches so network time overlaps across requests.
+    """
+    vectors = [
+        {
+            "id": _vector_id(doc.page_content),
+            "values": vec.tolist() if hasattr(vec, "tolist") else list(vec),
+            "metadata": {"text": doc.page_content, **doc.metadata},
+        }
+        for doc, vec in zip(documents, embeddings)
+    ]
+
+    futures = [
+        pinecone_index.upsert(vectors=batch, namespace=namespace, async_req=True)
+        for batch in _chunked(vectors, UPSERT_BATCH_SIZE)
+    ]
+    for future in futures:
+        future.get()
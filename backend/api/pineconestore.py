@@ -1,27 +1,35 @@
 from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.schema import Document
+import hashlib
 import os
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = "codebase-app"
 
+UPSERT_BATCH_SIZE = 100
+
 pc = Pinecone(api_key=PINECONE_API_KEY)
 
-def store_embeddings(documents: list[Document]):
+def store_embeddings(documents: list[Document], embeddings):
     """Store of embeddings as Vector DB into Pinecone
 
     Args:
-        embeddings (list): List of embbedings with metadata 
+        documents (list): Documents whose page_content/metadata go to Pinecone
+        embeddings (list): Precomputed embedding vector per document
     """
-    
-    embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-    
-    index = pc.Index(PINECONE_INDEX_NAME)
-    vector_store = PineconeVectorStore.from_documents(
-        documents=documents,
-        embedding=embedding_function,
-        index_name=index
-    )
-    return vector_store
\ No newline at end of file
+
+    index = pc.Index(PINECONE_INDEX_NAME, pool_threads=10)
+    vectors = [
+        {
+            "id": hashlib.blake2b(doc.page_content.encode("utf-8", "replace"), digest_size=16).hexdigest(),
+            "values": vec.tolist() if hasattr(vec, "tolist") else list(vec),
+            "metadata": {"text": doc.page_content, **doc.metadata},
+        }
+        for doc, vec in zip(documents, embeddings)
+    ]
+    futures = [
+        index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], async_req=True)
+        for i in range(0, len(vectors), UPSERT_BATCH_SIZE)
+    ]
+    for future in futures:
+        future.get()
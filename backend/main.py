@@ -1,11 +1,13 @@
+import asyncio
+import functools
 import os
 import logging
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from api.chunking_parsing_AST import parse_repo_store_all
-from api.embeddings import get_huggingface_embeddings
-from api.pinecone_interactions import store_embeddings, embedding_model, pinecone_index
-from git import Repo
+from api.embeddings import get_huggingface_embeddings, split_oversized_chunks
+from api.pinecone_interactions import store_embeddings, cached_query_vector, pinecone_index
+from git import GitCommandError, Repo
 from langchain.schema import Document
 from dotenv import load_dotenv
 import openai  # Using OpenAI client for simplified RAG
@@ -26,6 +28,10 @@ PINECONE_INDEX_KEY = "codebase-app"
 EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 CLONE_DIR = "./cloned_repos"
+BATCH_SIZE = 128  # chunks embedded/upserted per batch
+
+# Only the latest commit's tree is parsed, so skip history and old blobs
+SHALLOW_CLONE_OPTIONS = ["--depth=1", "--filter=blob:none", "--single-branch", "--no-tags"]
 
 # Initialize OpenAI client
 client = openai.OpenAI(
@@ -42,6 +48,21 @@ class RepoRequest(BaseModel):
 class QueryRequest(BaseModel):
     query: str
 
+def batched(items: list, size: int):
+    """Yield successive slices of at most `size` items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def chunk_text(chunk) -> str:
+    """Return just the code content of a chunk — the part worth embedding."""
+    return chunk["content"] if isinstance(chunk, dict) else chunk
+
+def chunk_metadata(chunk, repo_url: str) -> dict:
+    """Return the chunk's non-content fields (type, lines, ...) as metadata."""
+    metadata = {k: v for k, v in chunk.items() if k != "content"} if isinstance(chunk, dict) else {}
+    metadata["repo_url"] = repo_url
+    return metadata
+
 # GitHub Cloning
 def clone_repository(repo_url: str) -> str:
     """
@@ -55,7 +76,12 @@ def clone_repository(repo_url: str) -> str:
         if os.path.exists(repo_path):
             logger.info(f"Repository already exists: {repo_path}")
             return repo_path
-        Repo.clone_from(repo_url, repo_path)
+        try:
+            Repo.clone_from(repo_url, repo_path, multi_options=SHALLOW_CLONE_OPTIONS)
+        except GitCommandError:
+            # Some servers reject partial-clone filters; fall back to a full clone
+            logger.warning(f"Shallow clone failed for {repo_url}, retrying with a full clone")
+            Repo.clone_from(repo_url, repo_path)
         logger.info(f"Cloned repository to: {repo_path}")
         return repo_path
     except Exception as e:
@@ -69,13 +95,9 @@ def perform_rag(query: str, namespace="default") -> str:
     """
     logger.info(f"Performing RAG for query: {query} in namespace: {namespace}")
 
-    # Retrieve top documents from Pinecone
-     # Retrieve top documents from Pinecone
-    raw_query_embedding = embedding_model.embed_query(query)
-    if isinstance(raw_query_embedding, list):  # If already a list, no need to convert
-        vector = raw_query_embedding
-    else:  # If not a list, ensure it's converted to a list
-        vector = raw_query_embedding.tolist()
+    # Retrieve top documents from Pinecone; repeated queries hit the
+    # embedding cache instead of re-encoding
+    vector = list(cached_query_vector(query.strip()))
 
     response = pinecone_index.query(
         vector=vector,
@@ -121,39 +143,46 @@ async def submit_repo(request: RepoRequest):
     try:
         logger.info(f"Processing repository for namespace: {namespace}")
 
+        # Run the blocking stages in the executor so the event loop stays free
+        # to serve other requests (parse_repo_store_all fans out to its own
+        # process pool internally)
+        loop = asyncio.get_running_loop()
+
         # Clone repository
-        repo_path = clone_repository(request.repo_url)
+        repo_path = await loop.run_in_executor(None, clone_repository, request.repo_url)
 
         # Parse repository and store both structured chunks and raw file content
-        chunks = parse_repo_store_all(repo_path)
+        chunks = await loop.run_in_executor(None, parse_repo_store_all, repo_path)
         if not chunks:
             raise HTTPException(status_code=400, detail="No valid code chunks found in the repository.")
 
-        # Generate embeddings
-        embeddings = get_huggingface_embeddings([str(chunk) if isinstance(chunk, dict) else chunk for chunk in chunks])
+        # Window oversized chunks so the encoder doesn't truncate them
+        chunks = await loop.run_in_executor(None, split_oversized_chunks, chunks)
 
-        # Check if embeddings are valid
-        if not isinstance(embeddings, (list, np.ndarray)) or len(embeddings) == 0:
-            raise HTTPException(status_code=500, detail="Failed to generate embeddings.")
+        # Embed and upsert in batches so RPC/transfer overhead is amortized
+        # and memory stays bounded on large repositories
+        for batch in batched(chunks, BATCH_SIZE):
+            # Generate embeddings over the code content only; the dict repr
+            # would prefix every sequence with {'type': ...} noise
+            texts = [chunk_text(chunk) for chunk in batch]
+            embeddings = await loop.run_in_executor(None, get_huggingface_embeddings, texts)
 
-        # Store embeddings in Pinecone
-        documents = []
-        for chunk in chunks:
-            if isinstance(chunk, dict):
-                # Convert dictionary chunks to a string format
-                content = str(chunk)
-            else:
-                # Use raw file content as-is
-                content = chunk
+            # Check if embeddings are valid
+            if not isinstance(embeddings, (list, np.ndarray)) or len(embeddings) == 0:
+                raise HTTPException(status_code=500, detail="Failed to generate embeddings.")
 
-            documents.append(
+            # Store embeddings in Pinecone with the structured fields as metadata
+            documents = [
                 Document(
-                    page_content=content,
-                    metadata={"repo_url": request.repo_url}
+                    page_content=text,
+                    metadata=chunk_metadata(chunk, request.repo_url)
                 )
-            )
+                for chunk, text in zip(batch, texts)
+            ]
 
-        store_embeddings(documents, namespace=namespace)
+            await loop.run_in_executor(
+                None, functools.partial(store_embeddings, documents, embeddings, namespace=namespace)
+            )
 
         return {"status": "success", "message": "Repository processed successfully."}
 
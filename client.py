@@ -0,0 +1,175 @@
+"""HTTP client layer shared by the Gradio UI.
+
+Owns the pooled httpx clients and the client-side caches so every UI
+variant talks to the backend through the same singletons.
+"""
+import hashlib
+import httpx
+import orjson
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Backend API URL
+API_URL = os.getenv("BACKEND_API_URL", "http://127.0.0.1:8000")
+
+# Default timeout for every backend call
+REQUEST_TIMEOUT = 60
+
+# Connection limits for the shared client
+_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+# Shared client so all in-flight queries reuse pooled keep-alive connections.
+# HTTP/2 multiplexes concurrent requests over one socket; fall back to
+# HTTP/1.1 when the optional h2 package is not installed.
+try:
+    _SESSION = httpx.Client(http2=True, timeout=REQUEST_TIMEOUT, limits=_LIMITS)
+except ImportError:
+    _SESSION = httpx.Client(http2=False, timeout=REQUEST_TIMEOUT, limits=_LIMITS)
+
+
+def get_session():
+    """Return the shared HTTP client used for backend calls."""
+    return _SESSION
+
+
+# Async client for the streaming query path; shares the same pool limits.
+_ASYNC_SESSION = httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=_LIMITS)
+
+# LRU cache of completed answers keyed on (namespace, message hash, last-turn
+# hash), so repeated questions skip the whole backend/LLM round-trip.
+_ANSWER_CACHE_MAXSIZE = 256
+_answer_cache = OrderedDict()
+
+
+def _answer_cache_key(namespace, message, history):
+    """Build the cache key for a query.
+
+    The backend prepends the conversation history to the query before RAG, so
+    answers are context-dependent: "explain that in more detail" means
+    something different in every conversation. Hashing the last turn keeps
+    those follow-ups from colliding across conversations in one namespace.
+    """
+    digest = hashlib.blake2b(message.encode(), digest_size=8).hexdigest()
+    last_turn = orjson.dumps(history[-1]) if history else b""
+    last_turn_digest = hashlib.blake2b(last_turn, digest_size=8).hexdigest()
+    return (namespace, digest, last_turn_digest)
+
+
+def _cache_answer(key, answer):
+    _answer_cache[key] = answer
+    _answer_cache.move_to_end(key)
+    while len(_answer_cache) > _ANSWER_CACHE_MAXSIZE:
+        _answer_cache.popitem(last=False)
+
+
+def invalidate_answer_cache(namespace):
+    """Drop cached answers for a namespace (e.g. after it is re-cloned)."""
+    for key in [k for k in _answer_cache if k[0] == namespace]:
+        del _answer_cache[key]
+
+
+# Short-lived namespace cache so bursts of UI interactions don't hammer the backend
+NAMESPACE_CACHE_TTL = 5  # seconds
+_namespace_cache = {"value": None, "fetched_at": 0.0}
+
+
+def invalidate_namespace_cache():
+    """Force the next fetch_namespaces call to hit the backend."""
+    _namespace_cache["value"] = None
+    _namespace_cache["fetched_at"] = 0.0
+
+
+def warm_backend_session():
+    """Open a connection to the backend so the first user query skips the handshake."""
+    try:
+        _SESSION.get(f"{API_URL}/healthz", timeout=2)
+    except Exception:
+        pass  # best effort — the backend may simply not be up yet
+
+
+def fetch_namespaces():
+    """Fetch namespaces from the backend, caching the result for a few seconds."""
+    now = time.monotonic()
+    if _namespace_cache["value"] is not None and now - _namespace_cache["fetched_at"] < NAMESPACE_CACHE_TTL:
+        return _namespace_cache["value"]
+    try:
+        response = _SESSION.get(f"{API_URL}/namespaces")
+        if response.status_code == 200:
+            namespaces = orjson.loads(response.content).get("namespaces", [])
+            _namespace_cache["value"] = namespaces
+            _namespace_cache["fetched_at"] = now
+            return namespaces
+        else:
+            print(f"Failed to fetch namespaces. Status code: {response.status_code}")
+            return []
+    except Exception as e:
+        print(f"Error fetching namespaces: {e}")
+        return []
+
+
+def submit_repository(repo_url):
+    """Clone and index a new repository by sending it to the backend."""
+    try:
+        response = _SESSION.post(
+            f"{API_URL}/submit-repo",
+            content=orjson.dumps({"repo_url": repo_url}),
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code == 200:
+            invalidate_namespace_cache()
+            invalidate_answer_cache(repo_url.split("/")[-1].replace(".git", ""))
+            return orjson.loads(response.content).get("message", "Repository indexed successfully! 🚀")
+        else:
+            return f"Error: {orjson.loads(response.content).get('detail', 'Unknown error')}"
+    except Exception as e:
+        return f"Failed to clone repository: {str(e)}"
+
+
+def _with_turn(history, message, answer):
+    """Return history extended with one user/assistant turn in messages format."""
+    return history + [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": answer},
+    ]
+
+
+async def query_with_history(message, history, namespace):
+    """Stream the backend answer for a query, yielding the growing chat history."""
+    cache_key = _answer_cache_key(namespace, message, history)
+    cached = _answer_cache.get(cache_key)
+    if cached is not None:
+        _answer_cache.move_to_end(cache_key)
+        yield _with_turn(history, message, cached)
+        return
+    try:
+        # History is already in the backend's role/content format — pass it through
+        payload = {"query": message, "history": history, "namespace": namespace}
+        answer = ""
+        async with _ASYNC_SESSION.stream(
+            "POST",
+            f"{API_URL}/query/stream",
+            content=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                yield _with_turn(history, message, f"Error: status code {response.status_code}")
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                answer += orjson.loads(data).get("token", "")
+                yield _with_turn(history, message, answer)
+        if answer:
+            _cache_answer(cache_key, answer)
+        yield _with_turn(history, message, answer or "No response.")
+    except Exception as e:
+        yield _with_turn(history, message, f"Failed to process query: {str(e)}")
@@ -1,11 +1,15 @@
+import asyncio
+import functools
 import os
+import json
 import logging
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from backend.api.chunking_parsing_AST import parse_repo_store_all
-from backend.api.embeddings import get_huggingface_embeddings
-from backend.api.pinecone_interactions import store_embeddings, embedding_model, pinecone_index
-from git import Repo
+from backend.api.embeddings import get_huggingface_embeddings, split_oversized_chunks
+from backend.api.pinecone_interactions import store_embeddings, cached_query_vector, pinecone_index
+from git import GitCommandError, Repo
 from langchain.schema import Document
 from dotenv import load_dotenv
 import openai
@@ -26,6 +30,10 @@ PINECONE_INDEX_KEY = "codebase-app"
 EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 CLONE_DIR = "./cloned_repos"
+BATCH_SIZE = 128  # chunks embedded/upserted per batch
+
+# Only the latest commit's tree is parsed, so skip history and old blobs
+SHALLOW_CLONE_OPTIONS = ["--depth=1", "--filter=blob:none", "--single-branch", "--no-tags"]
 
 # Initialize OpenAI client
 client = openai.OpenAI(
@@ -42,6 +50,21 @@ class QueryRequest(BaseModel):
     history: list
     namespace: str
 
+def batched(items: list, size: int):
+    """Yield successive slices of at most `size` items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def chunk_text(chunk) -> str:
+    """Return just the code content of a chunk — the part worth embedding."""
+    return chunk["content"] if isinstance(chunk, dict) else chunk
+
+def chunk_metadata(chunk, repo_url: str) -> dict:
+    """Return the chunk's non-content fields (type, lines, ...) as metadata."""
+    metadata = {k: v for k, v in chunk.items() if k != "content"} if isinstance(chunk, dict) else {}
+    metadata["repo_url"] = repo_url
+    return metadata
+
 # GitHub Cloning
 def clone_repository(repo_url: str) -> str:
     repo_name = repo_url.split("/")[-1].replace(".git", "")
@@ -52,7 +75,12 @@ def clone_repository(repo_url: str) -> str:
         if os.path.exists(repo_path):
             logger.info(f"Repository already exists: {repo_path}")
             return repo_path
-        Repo.clone_from(repo_url, repo_path)
+        try:
+            Repo.clone_from(repo_url, repo_path, multi_options=SHALLOW_CLONE_OPTIONS)
+        except GitCommandError:
+            # Some servers reject partial-clone filters; fall back to a full clone
+            logger.warning(f"Shallow clone failed for {repo_url}, retrying with a full clone")
+            Repo.clone_from(repo_url, repo_path)
         logger.info(f"Cloned repository to: {repo_path}")
         return repo_path
     except Exception as e:
@@ -60,10 +88,10 @@ def clone_repository(repo_url: str) -> str:
         raise HTTPException(status_code=500, detail="Failed to clone repository.")
 
 # Simplified RAG Process
-def perform_rag(query: str, namespace="default") -> str:
-    logger.info(f"Performing RAG for query: {query} in namespace: {namespace}")
-    raw_query_embedding = embedding_model.embed_query(query)
-    vector = raw_query_embedding if isinstance(raw_query_embedding, list) else raw_query_embedding.tolist()
+def retrieve_context(query: str, namespace="default") -> str:
+    """Embed the query, retrieve matches from Pinecone, and build the augmented prompt."""
+    logger.info(f"Retrieving context for query: {query} in namespace: {namespace}")
+    vector = list(cached_query_vector(query.strip()))
     logger.info(f"Embedding vector length: {len(vector)}")
     response = pinecone_index.query(
         vector=vector,
@@ -73,9 +101,14 @@ def perform_rag(query: str, namespace="default") -> str:
     )
     logger.info(f"Pinecone query response: {response}")
     if not response['matches']:
-        return "No relevant context found for the query."
+        return None
     contexts = [match['metadata'].get('text', '') for match in response['matches']]
-    augmented_query = "<CONTEXT>\n" + "\n\n-------\n\n".join(contexts) + "\n-------\n</CONTEXT>\n\n" + query
+    return "<CONTEXT>\n" + "\n\n-------\n\n".join(contexts) + "\n-------\n</CONTEXT>\n\n" + query
+
+def perform_rag(query: str, namespace="default") -> str:
+    augmented_query = retrieve_context(query, namespace=namespace)
+    if augmented_query is None:
+        return "No relevant context found for the query."
     llm_response = client.chat.completions.create(
         model="llama-3.1-8b-instant",
         messages=[
@@ -85,7 +118,32 @@ def perform_rag(query: str, namespace="default") -> str:
     )
     return llm_response.choices[0].message.content
 
+def perform_rag_stream(query: str, namespace="default"):
+    """Yield the RAG answer token by token as SSE frames."""
+    augmented_query = retrieve_context(query, namespace=namespace)
+    if augmented_query is None:
+        yield f"data: {json.dumps({'token': 'No relevant context found for the query.'})}\n\n"
+        yield "data: [DONE]\n\n"
+        return
+    stream = client.chat.completions.create(
+        model="llama-3.1-8b-instant",
+        messages=[
+            {"role": "system", "content": "Answer as concisely as possible."},
+            {"role": "user", "content": augmented_query}
+        ],
+        stream=True
+    )
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield f"data: {json.dumps({'token': delta})}\n\n"
+    yield "data: [DONE]\n\n"
+
 # API Endpoints
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
 @app.get("/namespaces")
 async def list_namespaces():
     try:
@@ -99,30 +157,57 @@ async def list_namespaces():
 async def submit_repo(request: RepoRequest):
     namespace = request.repo_url.split("/")[-1].replace(".git", "")
     try:
-        repo_path = clone_repository(request.repo_url)
-        chunks = parse_repo_store_all(repo_path)
+        # Run the blocking stages in the executor so the event loop stays free
+        # to serve other requests (parse_repo_store_all fans out to its own
+        # process pool internally)
+        loop = asyncio.get_running_loop()
+        repo_path = await loop.run_in_executor(None, clone_repository, request.repo_url)
+        chunks = await loop.run_in_executor(None, parse_repo_store_all, repo_path)
         if not chunks:
             raise HTTPException(status_code=400, detail="No valid code chunks found.")
-        embeddings = get_huggingface_embeddings(chunks)
-        documents = [
-            Document(page_content=str(chunk), metadata={"repo_url": request.repo_url})
-            for chunk in chunks
-        ]
-        store_embeddings(documents, namespace=namespace)
+        # Window oversized chunks so the encoder doesn't truncate them
+        chunks = await loop.run_in_executor(None, split_oversized_chunks, chunks)
+        # Embed and upsert in batches so RPC/transfer overhead is amortized
+        # and memory stays bounded on large repositories
+        for batch in batched(chunks, BATCH_SIZE):
+            # Embed only the code content; the dict repr would prefix every
+            # sequence with {'type': ...} noise and waste tokens
+            texts = [chunk_text(chunk) for chunk in batch]
+            embeddings = await loop.run_in_executor(None, get_huggingface_embeddings, texts)
+            documents = [
+                Document(page_content=text, metadata=chunk_metadata(chunk, request.repo_url))
+                for chunk, text in zip(batch, texts)
+            ]
+            await loop.run_in_executor(
+                None, functools.partial(store_embeddings, documents, embeddings, namespace=namespace)
+            )
         return {"status": "success", "message": "Repository processed successfully."}
     except Exception as e:
         logger.error(f"Error in submit_repo: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _augment_with_history(query: str, history: list) -> str:
+    history_context = "\n".join([f"{entry['role']}: {entry['content']}" for entry in history])
+    return f"History:\n{history_context}\n\nQuery:\n{query}" if history_context else query
+
 @app.post("/query")
 async def query_codebase(request: QueryRequest):
     try:
-        namespace = request.namespace
-        query = request.query
-        history_context = "\n".join([f"{entry['role']}: {entry['content']}" for entry in request.history])
-        augmented_query = f"History:\n{history_context}\n\nQuery:\n{query}" if history_context else query
-        answer = perform_rag(augmented_query, namespace=namespace)
+        augmented_query = _augment_with_history(request.query, request.history)
+        answer = perform_rag(augmented_query, namespace=request.namespace)
         return {"answer": answer}
     except Exception as e:
         logger.error(f"Error in query_codebase: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/query/stream")
+async def query_codebase_stream(request: QueryRequest):
+    try:
+        augmented_query = _augment_with_history(request.query, request.history)
+        return StreamingResponse(
+            perform_rag_stream(augmented_query, namespace=request.namespace),
+            media_type="text/event-stream"
+        )
+    except Exception as e:
+        logger.error(f"Error in query_codebase_stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))